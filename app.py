@@ -1,28 +1,224 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+import atexit
+import logging
+from dataclasses import dataclass, field
+from flask import Flask, Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, g
+from flask_session import Session
 from dotenv import load_dotenv
+import redis
 import requests
-import json
-from flask import make_response  
+from requests.adapters import HTTPAdapter
+from requests_toolbelt import MultipartEncoder
+from urllib3.util.retry import Retry
+import orjson
+import fastjsonschema
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba es opcional; sin él se usa la versión NumPy
+    njit = None
+from flask import Response, stream_with_context
+
+import keystroke_kernels
 
 load_dotenv()
 
 API_BASE = os.getenv("API_BASE")
+
+# URLs de la API precalculadas al importar
+LOGIN_URL = f"{API_BASE}/api/users/login/"
+REGISTER_URL = f"{API_BASE}/api/users/registrar/"
+DECRYPT_URL = f"{API_BASE}/api/passwords/decrypt/"
+VAULT_PW_URL = f"{API_BASE}/api/users/vault/passwords/"
+VAULT_FILES_URL = f"{API_BASE}/api/users/vault/files/"
+VAULT_DOWNLOAD_URL = f"{API_BASE}/api/users/vault/files/download/"
 SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
 app = Flask(__name__)
 app.secret_key = SECRET_KEY
 
+# En producción (INFO) los log.debug se descartan con una simple comprobación de nivel
+log = app.logger
+log.setLevel(LOG_LEVEL)
+
+# Cliente Redis compartido (sesiones y caché de listados de la bóveda)
+redis_pool = redis.ConnectionPool.from_url(REDIS_URL)
+cache = redis.Redis(connection_pool=redis_pool)
+VAULT_CACHE_TTL = 60  # segundos
+
+# Sesiones del lado del servidor en Redis: la cookie solo lleva el id de sesión
+app.config.update(
+    SESSION_TYPE="redis",
+    SESSION_REDIS=cache,
+    SESSION_PERMANENT=False,  # Como la cookie por defecto de Flask: dura hasta cerrar el navegador
+)
+Session(app)
+
+# Sesión HTTP compartida: reutiliza conexiones (keep-alive) hacia la API
+API_TIMEOUT = (3, 10)  # (conexión, lectura) en segundos
+DOWNLOAD_TIMEOUT = (3, 30)
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+http = requests.Session()
+adapter = HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=100,
+    # Reintentos por estado solo en GET (idempotente); tras agotarlos se devuelve la
+    # última respuesta de la API en lugar de lanzar MaxRetryError
+    max_retries=Retry(
+        total=2,
+        backoff_factor=0.1,
+        status_forcelist=[502, 503, 504],
+        allowed_methods={"GET"},
+        raise_on_status=False,
+    ),
+)
+http.mount("http://", adapter)
+http.mount("https://", adapter)
+atexit.register(http.close)
+
+
+# Esquemas de keystroke, compilados una vez al importar
+MAX_KEYSTROKES = 256  # eventos por intento
+MAX_ATTEMPTS = 3  # intentos de práctica por registro
+TIMINGS_SCHEMA = {
+    "type": "array",
+    "maxItems": MAX_KEYSTROKES,
+    "items": {
+        "type": "object",
+        "required": ["key", "press_time", "release_time"],
+        "properties": {
+            "key": {"type": "string"},
+            "press_time": {"type": "number"},
+            "release_time": {"type": "number"}
+        }
+    }
+}
+TPU_SCHEMA = {
+    "type": "object",
+    "required": ["password", "keystroke_timings"],
+    "properties": {
+        "password": {"type": "string"},
+        "keystroke_timings": TIMINGS_SCHEMA,
+        "total_time": {"type": "number"}
+    }
+}
+
+# /keystroke/validate solo analiza los tiempos: la contraseña no es necesaria
+validate_timings = fastjsonschema.compile({
+    "type": "object",
+    "required": ["keystroke_timings"],
+    "properties": {"keystroke_timings": TIMINGS_SCHEMA}
+})
+
+# Todos los intentos de práctica, acumulados en el cliente y enviados juntos
+validate_practice = fastjsonschema.compile({
+    "type": "object",
+    "required": ["attempts"],
+    "properties": {
+        "attempts": {"type": "array", "minItems": 1, "maxItems": MAX_ATTEMPTS, "items": TPU_SCHEMA}
+    }
+})
+
 
 # -------------- Helpers ----------------
 def api_headers():
-    hdrs = {"Accept": "application/json"}
-    token = session.get("token")
-    if token:
-        hdrs["Authorization"] = f"Bearer {token}"
+    # Se calcula una sola vez por petición y se guarda en flask.g
+    hdrs = g.get("_api_hdrs")
+    if hdrs is None:
+        hdrs = {"Accept": "application/json"}
+        token = session.get("token")
+        if token:
+            hdrs["Authorization"] = f"Bearer {token}"
+        g._api_hdrs = hdrs
     return hdrs
 
 
+def is_json(r):
+    return r.headers.get("content-type", "").startswith("application/json")
+
+
+def json_body(r):
+    """
+    Parsea una sola vez el cuerpo JSON de una respuesta de la API (None si no es JSON)
+    """
+    if is_json(r):
+        return orjson.loads(r.content)
+    return None
+
+
+def passthrough(r):
+    """
+    Devuelve tal cual el cuerpo JSON de la API, sin parsearlo ni volver a serializarlo
+    """
+    if not is_json(r):
+        # p. ej. una página HTML de error de un proxy: no se reenvía como JSON
+        return jsonify({"success": False, "message": f"Error API: {r.status_code}"})
+    return Response(r.content, status=r.status_code, mimetype="application/json")
+
+
+def vault_pw_url(uid):
+    return "%s%s" % (VAULT_PW_URL, uid)
+
+
+def vault_files_url(uid):
+    return "%s%s" % (VAULT_FILES_URL, uid)
+
+
+def vault_pw_key(uid):
+    return f"vault:pw:{uid}"
+
+
+def vault_files_key(uid):
+    return f"vault:files:{uid}"
+
+
+def cached_listing(key, url):
+    """
+    GET de un listado de la bóveda con caché corta en Redis (solo respuestas 200)
+    """
+    blob = cache.get(key)
+    if blob:
+        return Response(blob, mimetype="application/json")
+    
+    r = http.get(url, timeout=API_TIMEOUT)
+    if r.status_code == 200 and is_json(r):
+        cache.setex(key, VAULT_CACHE_TTL, r.content)
+    return passthrough(r)
+
+
+def invalidate_listing(r, key):
+    """
+    Borra el listado cacheado si la API aceptó la modificación
+    """
+    if 200 <= r.status_code < 300:
+        cache.delete(key)
+
+
+@dataclass(slots=True)
+class KeystrokeAttempt:
+    """Intento de keystroke en formato Struct-of-Arrays, con sus dwell times precalculados"""
+    keys: list
+    press: np.ndarray
+    release: np.ndarray
+    password: str = ""
+    total_time: float = 0
+    dwell: np.ndarray = field(init=False)
+
+    def __post_init__(self):
+        self.dwell = self.release - self.press
+
+
+def practice_attempt(data):
+    """
+    Convierte un intento de práctica ya validado en un KeystrokeAttempt
+    """
+    return keystroke_soa(data['keystroke_timings'], data['password'], data.get('total_time', 0))
+
+
 def validate_keystroke_consistency(attempts, threshold=0.7):
     """
     Valida que los patrones de keystroke sean consistentes entre intentos
@@ -30,23 +226,36 @@ def validate_keystroke_consistency(attempts, threshold=0.7):
     if len(attempts) < 3:
         return False, "Se requieren al menos 3 intentos"
     
-    # Verificar contraseñas iguales
-    passwords = [attempt.get('password', '') for attempt in attempts]
-    if not all(pwd == passwords[0] for pwd in passwords):
-        return False, "Las contraseñas no coinciden"
-    
-    # Verificar que todos los intentos tengan datos de keystroke
-    if any(not attempt.get('keystroke_timings') for attempt in attempts):
+    # Una sola pasada: contraseñas iguales, datos de keystroke presentes y dwell times
+    # (precalculados al registrar el intento); sale en el primer intento inválido
+    ref = attempts[0]
+    if not ref.keys:
         return False, "Faltan datos de keystroke en algunos intentos"
     
-    # Calcular similitud entre intentos
-    similarities = []
-    for i in range(len(attempts) - 1):
-        for j in range(i + 1, len(attempts)):
-            sim = calculate_similarity(attempts[i], attempts[j])
-            similarities.append(sim)
-    
-    avg_similarity = sum(similarities) / len(similarities) if similarities else 0
+    dwells = [ref.dwell]
+    same_keys = True
+    
+    for attempt in attempts[1:]:
+        if attempt.password != ref.password:
+            return False, "Las contraseñas no coinciden"
+        if not attempt.keys:
+            return False, "Faltan datos de keystroke en algunos intentos"
+        # ev.key incluye Shift, Backspace, etc.: la misma contraseña no implica las mismas teclas
+        same_keys = same_keys and attempt.keys == ref.keys
+        dwells.append(attempt.dwell)
+    
+    if same_keys:
+        # Misma secuencia de teclas en todos: un solo kernel sobre la matriz (n_intentos, n_teclas)
+        avg_similarity = pairwise_sim(np.array(dwells, dtype=np.float64))
+    else:
+        # Calcular similitud entre intentos, comparando solo posiciones con la misma tecla
+        similarities = []
+        for i in range(len(attempts) - 1):
+            for j in range(i + 1, len(attempts)):
+                sim = calculate_similarity(attempts[i], attempts[j])
+                similarities.append(sim)
+        
+        avg_similarity = sum(similarities) / len(similarities) if similarities else 0
     
     if avg_similarity < threshold:
         return False, f"Patrón inconsistente (similitud: {avg_similarity:.2%})"
@@ -54,54 +263,103 @@ def validate_keystroke_consistency(attempts, threshold=0.7):
     return True, f"Patrón válido (similitud: {avg_similarity:.2%})"
 
 
+def keystroke_soa(timings, password="", total_time=0):
+    """
+    Convierte los timings (lista de dicts) a un KeystrokeAttempt: keys, press, release
+    """
+    n = len(timings)
+    return KeystrokeAttempt(
+        keys=[t['key'] for t in timings],
+        # float32 sobra para milisegundos y ocupa la mitad que float64
+        press=np.fromiter((t['press_time'] for t in timings), dtype=np.float32, count=n),
+        release=np.fromiter((t['release_time'] for t in timings), dtype=np.float32, count=n),
+        password=password,
+        total_time=total_time
+    )
+
+
 def calculate_similarity(attempt1, attempt2):
     """
     Calcula similitud entre dos intentos de keystroke
     """
-    timings1 = attempt1.get('keystroke_timings', [])
-    timings2 = attempt2.get('keystroke_timings', [])
-    
-    if len(timings1) != len(timings2) or len(timings1) == 0:
+    if len(attempt1.keys) != len(attempt2.keys) or len(attempt1.keys) == 0:
         return 0.0
     
-    total_diff = 0
-    valid_comparisons = 0
+    if attempt1.keys == attempt2.keys:
+        return dwell_similarity(attempt1.dwell, attempt2.dwell)
     
-    for i in range(min(len(timings1), len(timings2))):
-        t1 = timings1[i]
-        t2 = timings2[i]
-        
-        if t1.get('key') == t2.get('key'):
-            dwell1 = t1.get('release_time', 0) - t1.get('press_time', 0)
-            dwell2 = t2.get('release_time', 0) - t2.get('press_time', 0)
-            
-            diff = abs(dwell1 - dwell2)
-            total_diff += diff
-            valid_comparisons += 1
+    # Solo se comparan posiciones donde coincide la tecla
+    mask = np.fromiter((k1 == k2 for k1, k2 in zip(attempt1.keys, attempt2.keys)), dtype=bool, count=len(attempt1.keys))
+    if not mask.any():
+        return 0.0
     
-    if valid_comparisons == 0:
+    return dwell_similarity(attempt1.dwell[mask], attempt2.dwell[mask])
+
+
+def dwell_similarity(dwell1, dwell2):
+    """
+    Similitud entre dos vectores de dwell times
+    """
+    if len(dwell1) != len(dwell2) or len(dwell1) == 0:
         return 0.0
     
-    avg_diff = total_diff / valid_comparisons
+    diffs = np.abs(np.asarray(dwell1, dtype=np.float64) - np.asarray(dwell2, dtype=np.float64))
+    avg_diff = float(diffs.mean())
     max_allowed_diff = 200  # ms
     
     similarity = max(0.0, 1.0 - (avg_diff / max_allowed_diff))
     return similarity
 
 
+def pairwise_sim_numpy(dwell):
+    """
+    Similitud media entre todos los pares de intentos de una matriz (n_intentos, n_teclas)
+    """
+    i, j = np.triu_indices(dwell.shape[0], k=1)
+    avg_diff = np.abs(dwell[i] - dwell[j]).mean(axis=1)
+    return float(np.maximum(0.0, 1.0 - avg_diff / 200).mean())
+
+
+try:
+    # Kernel nativo compilado por adelantado con build_kernels.py
+    from ks_kernels import pairwise_sim
+except ImportError:
+    if njit is not None:
+        pairwise_sim = njit(cache=True, fastmath=True)(keystroke_kernels.pairwise_sim)
+        # Compilar al importar para no pagar el JIT en la primera petición
+        pairwise_sim(np.zeros((2, 1)))
+    else:
+        pairwise_sim = pairwise_sim_numpy
+
+
 # -------------- Rutas -------------------
 
-@app.get("/")
+auth_bp = Blueprint("auth", __name__)
+vault_bp = Blueprint("vault", __name__)
+
+# Páginas HTML de la bóveda; el resto de sus rutas responde JSON
+VAULT_PAGES = {"vault.dashboard", "vault.vault", "vault.download_file"}
+
+
+@vault_bp.before_request
+def require_login():
+    """Verificación de sesión única para todas las rutas de la bóveda"""
+    if "user" not in session:
+        if request.endpoint in VAULT_PAGES:
+            return redirect(url_for("auth.login"))
+        return jsonify({"success": False, "message": "No autenticado"}), 401
+
+@auth_bp.get("/")
 def home():
     if session.get("token"):
-        return redirect(url_for("dashboard"))
-    return redirect(url_for("login"))
+        return redirect(url_for("vault.dashboard"))
+    return redirect(url_for("auth.login"))
 
-@app.get("/login")
+@auth_bp.get("/login")
 def login():
     return render_template("login.html")
 
-@app.post("/login")
+@auth_bp.post("/login")
 def do_login():
     email = request.form.get("email", "").strip().lower()
     password = request.form.get("password", "")
@@ -119,34 +377,36 @@ def do_login():
 
     try:
         # Enviar como form-data a FastAPI
-        r = requests.post(
-            f"{API_BASE}/api/users/login/",
+        r = http.post(
+            LOGIN_URL,
             data=data,  # Cambié de 'files' a 'data'
-            headers={"Content-Type": "application/x-www-form-urlencoded"}
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+            timeout=API_TIMEOUT
         )
         
+        body = json_body(r)
+        
         if r.status_code != 200:
-            detail = r.json().get("detail", "Credenciales inválidas")
+            detail = body.get("detail", "Credenciales inválidas") if body else "Credenciales inválidas"
             flash(f"Error: {detail}", "danger")
-            return redirect(url_for("login"))
+            return redirect(url_for("auth.login"))
         
-        data = r.json()
-        session["token"] = data["access_token"]
-        session["user"] = data["user_info"]
+        session["token"] = body["access_token"]
+        session["user"] = body["user_info"]
+        # Nuevo id de sesión al autenticarse (evita fijación de sesión)
+        app.session_interface.regenerate(session)
         flash("Sesión iniciada", "success")
-        return redirect(url_for("dashboard"))
+        return redirect(url_for("vault.dashboard"))
         
     except Exception as e:
         flash(f"Error de conexión: {e}", "danger")
-        return redirect(url_for("login"))
+        return redirect(url_for("auth.login"))
 
-@app.get("/register")
+@auth_bp.get("/register")
 def register():
-    # Limpiar cualquier sesión de práctica anterior
-    session.pop('practice_attempts', None)
     return render_template("register.html")
 
-@app.post("/register/practice")
+@auth_bp.post("/register/practice")
 def register_practice():
     try:
         data = request.get_json()
@@ -155,23 +415,13 @@ def register_practice():
             return jsonify({"error": "No se recibieron datos"}), 400
         
         # Asegurarnos de que los datos tienen la estructura correcta
-        if 'password' not in data or 'keystroke_timings' not in data:
+        try:
+            validate_practice(data)
+        except fastjsonschema.JsonSchemaException:
             return jsonify({"error": "Datos de keystroke incompletos"}), 400
         
-        # Obtener intentos previos de la sesión
-        practice_attempts = session.get('practice_attempts', [])
-        
-        # Agregar el nuevo intento (asegurando el formato)
-        practice_attempts.append({
-            'password': data['password'],
-            'keystroke_timings': data['keystroke_timings'],
-            'total_time': data.get('total_time', 0)
-        })
-        
-        # Guardar en sesión (asegurando que se persista)
-        session['practice_attempts'] = practice_attempts
-        session.modified = True  # Esto fuerza a Flask a guardar los cambios
-        
+        # Los intentos se acumulan en el cliente: aquí solo se evalúan, sin tocar la sesión
+        practice_attempts = [practice_attempt(attempt) for attempt in data['attempts']]
         attempt_number = len(practice_attempts)
         
         if attempt_number < 3:
@@ -196,7 +446,7 @@ def register_practice():
     except Exception as e:
         return jsonify({"error": f"Error del servidor: {str(e)}"}), 500
 
-@app.post("/register")
+@auth_bp.post("/register")
 def do_register():
     # Obtener datos del formulario
     name = request.form.get("name", "").strip()
@@ -207,89 +457,83 @@ def do_register():
     
     if not tpu_json:
         flash("Debes completar la práctica de contraseña", "danger")
-        return redirect(url_for("register"))
+        return redirect(url_for("auth.register"))
     
     try:
-        tpu_data = json.loads(tpu_json)
-    except json.JSONDecodeError:
+        tpu_data = validate_practice(orjson.loads(tpu_json))
+    except (orjson.JSONDecodeError, fastjsonschema.JsonSchemaException):
         flash("Error en los datos de keystroke", "danger")
-        return redirect(url_for("register"))
+        return redirect(url_for("auth.register"))
     
     # Validar que la contraseña final coincide con la práctica
-    if not passwordu or passwordu != tpu_data.get('password', ''):
+    attempts = [practice_attempt(attempt) for attempt in tpu_data['attempts']]
+    if not passwordu or passwordu != attempts[0].password:
         flash("La contraseña final no coincide con la práctica", "danger")
-        return redirect(url_for("register"))
+        return redirect(url_for("auth.register"))
     
-    # Preparar payload para la API
+    # Validar en el servidor la consistencia de todos los intentos, una sola vez
+    is_valid, message = validate_keystroke_consistency(attempts)
+    if not is_valid:
+        flash(message, "danger")
+        return redirect(url_for("auth.register"))
+    
+    # Preparar payload para la API con el primer intento, el mismo que se acaba de validar
+    tpu = tpu_data['attempts'][0]
     payload = {
         "name": name,
         "email": email,
         "passwordu": passwordu,
         "secretu": secretu,
         "tpu": {
-            "password": tpu_data['password'],
-            "keystroke_timings": tpu_data['keystroke_timings'],
-            "total_time": tpu_data['total_time']
+            "password": tpu['password'],
+            "keystroke_timings": tpu['keystroke_timings'],
+            "total_time": tpu.get('total_time', 0)
         }
     }
     
     try:
         # Enviar a tu API
-        r = requests.post(f"{API_BASE}/api/users/registrar/", json=payload, timeout=15)
+        r = http.post(REGISTER_URL, json=payload, timeout=API_TIMEOUT)
         
         if r.status_code not in (200, 201):
-            detail = r.json().get("detail", "No se pudo registrar") 
+            body = json_body(r)
+            detail = body.get("detail", "No se pudo registrar") if body else "No se pudo registrar"
             flash(f"Error: {detail}", "danger")
-            return redirect(url_for("register"))
+            return redirect(url_for("auth.register"))
         
         flash("Cuenta creada exitosamente", "success")
         
         # Auto-login
         files = {"username": (None, email), "password": (None, passwordu)}
-        lr = requests.post(f"{API_BASE}/api/users/login/", files=files, timeout=10)
+        lr = http.post(LOGIN_URL, files=files, timeout=API_TIMEOUT)
         
         if lr.status_code == 200:
-            data = lr.json()
-            session["token"] = data["access_token"]
-            session["user"] = data["user_info"]
-            return redirect(url_for("dashboard"))
+            body = json_body(lr)
+            session["token"] = body["access_token"]
+            session["user"] = body["user_info"]
+            app.session_interface.regenerate(session)
+            return redirect(url_for("vault.dashboard"))
         
-        return redirect(url_for("login"))
+        return redirect(url_for("auth.login"))
         
     except Exception as e:
         flash(f"Error de conexión: {e}", "danger")
-        return redirect(url_for("register"))
+        return redirect(url_for("auth.register"))
     
-@app.route('/dashboard')
+@vault_bp.route('/dashboard')
 def dashboard():
-    if 'token' not in session:
-        return redirect(url_for('login'))
-    
     return render_template("dashboard.html", user=session["user"])
 
 
 
-@app.post("/logout")
+@auth_bp.post("/logout")
 def logout():
     session.clear()
     flash("Sesión cerrada", "info")
-    return redirect(url_for("login"))
-
-# ---------- Endpoint para debug de keystroke ----------
-@app.get("/keystroke/debug")
-def keystroke_debug():
-    """Endpoint para debugging de patrones de keystroke"""
-    if not session.get("token"):
-        return redirect(url_for("login"))
-    
-    practice_attempts = session.get('practice_attempts', [])
-    return jsonify({
-        "attempts": len(practice_attempts),
-        "data": practice_attempts
-    })
+    return redirect(url_for("auth.login"))
 
 # ---------- Validación en tiempo real de keystroke ----------
-@app.post("/keystroke/validate")
+@auth_bp.post("/keystroke/validate")
 def validate_keystroke():
     """
     Valida un patrón de keystroke contra los patrones guardados del usuario
@@ -304,9 +548,15 @@ def validate_keystroke():
         if not keystroke_data:
             return jsonify({"error": "Datos de keystroke requeridos"}), 400
         
+        # Asegurarnos de que los datos tienen la estructura correcta
+        try:
+            validate_timings(keystroke_data)
+        except fastjsonschema.JsonSchemaException:
+            return jsonify({"error": "Datos de keystroke incompletos"}), 400
+        
         # Aquí podrías comparar contra los patrones guardados del usuario
         # Por ahora, solo validamos que el patrón sea válido
-        analysis = analyze_pattern(keystroke_data)
+        analysis = analyze_pattern(keystroke_soa(keystroke_data['keystroke_timings']))
         
         return jsonify({
             "valid": analysis['valid'],
@@ -318,78 +568,16 @@ def validate_keystroke():
         return jsonify({"error": f"Error del servidor: {str(e)}"}), 500
 
 
-def analyze_pattern(keystroke_data):
-    """
-    Analiza un patrón individual de keystroke
-    """
-    timings = keystroke_data.get('keystroke_timings', [])
-    
-    if len(timings) == 0:
-        return {"valid": False, "reason": "Sin datos de timing"}
-    
-    # Calcular métricas básicas
-    dwell_times = []
-    flight_times = []
-    
-    for timing in timings:
-        dwell = timing.get('release_time', 0) - timing.get('press_time', 0)
-        if dwell > 0:
-            dwell_times.append(dwell)
-    
-    for i in range(len(timings) - 1):
-        flight = timings[i + 1].get('press_time', 0) - timings[i].get('release_time', 0)
-        flight_times.append(flight)
-    
-    # Validaciones básicas
-    if not dwell_times:
-        return {"valid": False, "reason": "No hay dwell times válidos"}
-    
-    avg_dwell = sum(dwell_times) / len(dwell_times)
-    avg_flight = sum(flight_times) / len(flight_times) if flight_times else 0
-    
-    # Criterios de validación
-    valid = True
-    issues = []
-    
-    if avg_dwell < 30:
-        valid = False
-        issues.append("Dwell time promedio demasiado corto")
-    
-    if avg_dwell > 800:
-        valid = False
-        issues.append("Dwell time promedio demasiado largo")
-    
-    extreme_dwells = sum(1 for d in dwell_times if d > 1000 or d < 20)
-    if extreme_dwells > len(dwell_times) * 0.3:
-        valid = False
-        issues.append("Demasiados dwell times extremos")
-    
-    return {
-        "valid": valid,
-        "issues": issues,
-        "metrics": {
-            "avg_dwell": round(avg_dwell, 2),
-            "avg_flight": round(avg_flight, 2),
-            "total_keys": len(timings),
-            "valid_keys": len(dwell_times)
-        }
-    }
-
 # Agregar estas rutas a tu app.py
 
-@app.route("/vault")
+@vault_bp.route("/vault")
 def vault():
     """Página principal de la bóveda"""
-    if "user" not in session:
-        return redirect(url_for("login"))
     return render_template("vault.html", user=session["user"])
 
-@app.route("/verify-vault-access", methods=["POST"])
+@vault_bp.route("/verify-vault-access", methods=["POST"])
 def verify_vault_access():
     """Verificar acceso con contraseña maestra"""
-    if "user" not in session:
-        return jsonify({"success": False, "message": "No autenticado"})
-    
     password = request.form.get("password")
     keystroke_data = request.form.get("keystroke_data")
     
@@ -401,7 +589,7 @@ def verify_vault_access():
             "keystroke_data": keystroke_data
         }
         
-        r = requests.post(f"{API_BASE}/api/users/login/", data=data)
+        r = http.post(LOGIN_URL, data=data, timeout=API_TIMEOUT)
         
         if r.status_code == 200:
             return jsonify({"success": True, "message": "Acceso autorizado"})
@@ -411,58 +599,56 @@ def verify_vault_access():
     except Exception as e:
         return jsonify({"success": False, "message": f"Error: {e}"})
 
-def analyze_pattern(keystroke_data):
+def analyze_pattern(attempt):
     """
-    Analiza un patrón individual de keystroke
+    Analiza un patrón individual de keystroke (un KeystrokeAttempt)
     """
-    timings = keystroke_data.get('keystroke_timings', [])
+    press, release = attempt.press, attempt.release
     
-    if len(timings) == 0:
+    if press.size == 0:
         return {"valid": False, "reason": "Sin datos de timing"}
     
     # Calcular métricas básicas
-    dwell_times = []
-    
-    for timing in timings:
-        dwell = timing.get('release_time', 0) - timing.get('press_time', 0)
-        if dwell > 0:
-            dwell_times.append(dwell)
+    dwell_times = attempt.dwell
+    dwell_times = dwell_times[dwell_times > 0]
+    flight_times = press[1:] - release[:-1]
     
     # Validaciones básicas
-    if not dwell_times:
+    if dwell_times.size == 0:
         return {"valid": False, "reason": "No hay dwell times válidos"}
     
-    avg_dwell = sum(dwell_times) / len(dwell_times)
+    avg_dwell = float(dwell_times.mean(dtype=np.float64))
+    avg_flight = float(flight_times.mean(dtype=np.float64)) if flight_times.size else 0
     
     # Criterios de validación
-    valid = True
-    reason = "Patrón válido"
+    issues = []
     
     if avg_dwell < 30:
-        valid = False
-        reason = "Dwell time promedio demasiado corto"
+        issues.append("Dwell time promedio demasiado corto")
     elif avg_dwell > 800:
-        valid = False
-        reason = "Dwell time promedio demasiado largo"
+        issues.append("Dwell time promedio demasiado largo")
     
-    extreme_dwells = sum(1 for d in dwell_times if d > 1000 or d < 20)
-    if extreme_dwells > len(dwell_times) * 0.3:
-        valid = False
-        reason = "Demasiados dwell times extremos"
+    extreme_dwells = np.count_nonzero((dwell_times > 1000) | (dwell_times < 20))
+    if extreme_dwells > dwell_times.size * 0.3:
+        issues.append("Demasiados dwell times extremos")
     
     return {
-        "valid": valid,
-        "reason": reason,
+        "valid": not issues,
+        "reason": issues[-1] if issues else "Patrón válido",
         "avg_dwell": round(avg_dwell, 2),
-        "total_keys": len(timings)
+        "total_keys": len(attempt.keys),
+        "issues": issues,
+        "metrics": {
+            "avg_dwell": round(avg_dwell, 2),
+            "avg_flight": round(avg_flight, 2),
+            "total_keys": len(attempt.keys),
+            "valid_keys": int(dwell_times.size)
+        }
     }
 
-@app.route("/save-password", methods=["POST"])
+@vault_bp.route("/save-password", methods=["POST"])
 def save_password():
     """Guardar nueva contraseña en la bóveda"""
-    if "user" not in session:
-        return jsonify({"success": False, "message": "No autenticado"})
-    
     site_name = request.form.get("site_name")
     credentials = request.form.get("credentials")
     
@@ -473,40 +659,30 @@ def save_password():
     }
     
     try:
-        r = requests.post(f"{API_BASE}/api/users/vault/passwords/", data=data)
-        return jsonify(r.json())
+        r = http.post(VAULT_PW_URL, data=data, timeout=API_TIMEOUT)
+        invalidate_listing(r, vault_pw_key(session["user"]["id"]))
+        return passthrough(r)
     except Exception as e:
         return jsonify({"success": False, "message": f"Error: {e}"})
 
-@app.route("/get-passwords")
+@vault_bp.route("/get-passwords")
 def get_passwords():
     """Obtener lista de contraseñas del usuario"""
-    if "user" not in session:
-        return jsonify({"success": False, "message": "No autenticado"})
-    
     try:
-        r = requests.get(f"{API_BASE}/api/users/vault/passwords/{session['user']['id']}")
-        return jsonify(r.json())
+        uid = session["user"]["id"]
+        return cached_listing(vault_pw_key(uid), vault_pw_url(uid))
     except Exception as e:
         return jsonify({"success": False, "message": f"Error: {e}"})
 
-@app.route('/decrypt-password/<int:password_id>', methods=['POST'])
+@vault_bp.route('/decrypt-password/<int:password_id>', methods=['POST'])
 def decrypt_password(password_id):
-    if 'user' not in session:
-        return jsonify({'success': False, 'message': 'No autorizado'}), 401
-    
     try:
         password = request.form.get('password')
         keystroke_data = request.form.get('keystroke_data')
         
-        print(f"🔍 DEBUG: Desencriptando password_id={password_id}")
-        print(f"🔍 DEBUG: password length={len(password) if password else 0}")
-        print(f"🔍 DEBUG: user_id={session['user']['id']}")
-        
-        headers = {
-            'Authorization': f'Bearer {session["token"]}',
-            'Content-Type': 'application/x-www-form-urlencoded'
-        }
+        log.debug("Desencriptando password_id=%s", password_id)
+        log.debug("password length=%s", len(password) if password else 0)
+        log.debug("user_id=%s", session['user']['id'])
         
         data = {
             'password': password,
@@ -514,17 +690,19 @@ def decrypt_password(password_id):
             'user_id': session['user']['id']
         }
         
-        response = requests.post(
-            f"{API_BASE}/api/passwords/decrypt/{password_id}",
-            data=data,
-            headers=headers
+        response = http.post(
+            "%s%s" % (DECRYPT_URL, password_id),
+            data=data,  # requests pone Content-Type: application/x-www-form-urlencoded
+            headers=api_headers(),
+            timeout=API_TIMEOUT
         )
         
-        print(f"🔍 DEBUG: API response status={response.status_code}")
-        print(f"🔍 DEBUG: API response={response.text}")
+        log.debug("API response status=%s", response.status_code)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("API response=%s", response.text)
         
         if response.status_code == 200:
-            return jsonify(response.json())
+            return passthrough(response)
         else:
             return jsonify({
                 'success': False, 
@@ -532,27 +710,22 @@ def decrypt_password(password_id):
             })
         
     except Exception as e:
-        print(f"🔍 DEBUG: Exception={str(e)}")
+        log.exception("Error al desencriptar password_id=%s", password_id)
         return jsonify({'success': False, 'message': str(e)}), 500
     
-@app.route("/delete-password/<int:password_id>", methods=["DELETE"])
+@vault_bp.route("/delete-password/<int:password_id>", methods=["DELETE"])
 def delete_password(password_id):
     """Eliminar una contraseña"""
-    if "user" not in session:
-        return jsonify({"success": False, "message": "No autenticado"})
-    
     try:
-        r = requests.delete(f"{API_BASE}/api/users/vault/passwords/{password_id}?user_id={session['user']['id']}")
-        return jsonify(r.json())
+        r = http.delete("%s%s?user_id=%s" % (VAULT_PW_URL, password_id, session['user']['id']), timeout=API_TIMEOUT)
+        invalidate_listing(r, vault_pw_key(session["user"]["id"]))
+        return passthrough(r)
     except Exception as e:
         return jsonify({"success": False, "message": f"Error: {e}"})
 
-@app.route("/upload-file", methods=["POST"])
+@vault_bp.route("/upload-file", methods=["POST"])
 def upload_file():
     """Subir archivo a la bóveda"""
-    if "user" not in session:
-        return jsonify({"success": False, "message": "No autenticado"})
-    
     if "file" not in request.files:
         return jsonify({"success": False, "message": "No se seleccionó archivo"})
     
@@ -561,59 +734,73 @@ def upload_file():
         return jsonify({"success": False, "message": "Archivo vacío"})
     
     try:
-        files = {"file": (file.filename, file.stream, file.content_type)}
-        data = {"user_id": session["user"]["id"]}
+        # Envío multipart en streaming: el archivo no se carga completo en memoria
+        m = MultipartEncoder(fields={
+            "user_id": str(session["user"]["id"]),
+            "file": (file.filename, file.stream, file.content_type)
+        })
         
-        r = requests.post(f"{API_BASE}/api/users/vault/files/", files=files, data=data)
-        return jsonify(r.json())
+        r = http.post(
+            VAULT_FILES_URL,
+            data=m,
+            headers={"Content-Type": m.content_type},
+            timeout=API_TIMEOUT
+        )
+        invalidate_listing(r, vault_files_key(session["user"]["id"]))
+        return passthrough(r)
     except Exception as e:
         return jsonify({"success": False, "message": f"Error: {e}"})
 
-@app.route("/get-files")
+@vault_bp.route("/get-files")
 def get_files():
     """Obtener lista de archivos del usuario"""
-    if "user" not in session:
-        return jsonify({"success": False, "message": "No autenticado"})
-    
     try:
-        r = requests.get(f"{API_BASE}/api/users/vault/files/{session['user']['id']}")
-        return jsonify(r.json())
+        uid = session["user"]["id"]
+        return cached_listing(vault_files_key(uid), vault_files_url(uid))
     except Exception as e:
         return jsonify({"success": False, "message": f"Error: {e}"})
 
-@app.route("/download-file/<int:file_id>")
+@vault_bp.route("/download-file/<int:file_id>")
 def download_file(file_id):
     """Descargar archivo de la bóveda"""
-    if "user" not in session:
-        return redirect(url_for("login"))
-    
     try:
-        r = requests.get(f"{API_BASE}/api/users/vault/files/download/{file_id}?user_id={session['user']['id']}")
+        r = http.get(
+            "%s%s?user_id=%s" % (VAULT_DOWNLOAD_URL, file_id, session['user']['id']),
+            stream=True,
+            timeout=DOWNLOAD_TIMEOUT
+        )
         
         if r.status_code == 200:
-            response = make_response(r.content)
+            # Reenviar por bloques de 64 KiB sin cargar el archivo completo en memoria
+            response = Response(stream_with_context(r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)))
             response.headers["Content-Type"] = r.headers.get("Content-Type", "application/octet-stream")
             response.headers["Content-Disposition"] = r.headers.get("Content-Disposition", "attachment")
+            # iter_content descomprime, así que el tamaño solo es válido sin Content-Encoding
+            if "Content-Length" in r.headers and "Content-Encoding" not in r.headers:
+                response.headers["Content-Length"] = r.headers["Content-Length"]
+            response.call_on_close(r.close)
             return response
         else:
+            r.close()
             flash("Error al descargar archivo", "danger")
-            return redirect(url_for("vault"))
+            return redirect(url_for("vault.vault"))
     except Exception as e:
         flash(f"Error: {e}", "danger")
-        return redirect(url_for("vault"))
+        return redirect(url_for("vault.vault"))
 
-@app.route("/delete-file/<int:file_id>", methods=["DELETE"])
+@vault_bp.route("/delete-file/<int:file_id>", methods=["DELETE"])
 def delete_file(file_id):
     """Eliminar archivo de la bóveda"""
-    if "user" not in session:
-        return jsonify({"success": False, "message": "No autenticado"})
-    
     try:
-        r = requests.delete(f"{API_BASE}/api/users/vault/files/{file_id}?user_id={session['user']['id']}")
-        return jsonify(r.json())
+        r = http.delete("%s%s?user_id=%s" % (VAULT_FILES_URL, file_id, session['user']['id']), timeout=API_TIMEOUT)
+        invalidate_listing(r, vault_files_key(session["user"]["id"]))
+        return passthrough(r)
     except Exception as e:
         return jsonify({"success": False, "message": f"Error: {e}"})
     
+app.register_blueprint(auth_bp)
+app.register_blueprint(vault_bp)
 
+# Solo para desarrollo; en producción: gunicorn app:app (ver gunicorn.conf.py)
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,19 @@
+"""
+Compila por adelantado (AOT) los kernels de keystroke a un módulo nativo.
+
+Ejecutar durante el build/despliegue (requiere numba), en el directorio de app.py:
+
+    python build_kernels.py
+
+Genera ks_kernels.*.so; app.py lo importa si existe y así ninguna petición
+paga la compilación JIT de Numba.
+"""
+from numba.pycc import CC
+
+import keystroke_kernels
+
+cc = CC("ks_kernels")
+cc.export("pairwise_sim", "f8(f8[:,:])")(keystroke_kernels.pairwise_sim)
+
+if __name__ == "__main__":
+    cc.compile()
@@ -0,0 +1,15 @@
+# Configuración de producción: gunicorn app:app (lee este archivo automáticamente)
+import multiprocessing
+
+bind = "0.0.0.0:5000"
+workers = multiprocessing.cpu_count()
+
+# Hilos por worker: las rutas esperan sobre todo a la API, no a la CPU
+worker_class = "gthread"
+threads = 4
+
+# Importar app.py una vez antes de hacer fork: solo se comparten (copy-on-write) el
+# código importado y el kernel de Numba ya compilado. Al importar no se abre ningún
+# socket (requests y redis conectan de forma perezosa y redis-py reinicia su pool
+# tras el fork); no abrir conexiones a nivel de módulo para no romperlo
+preload_app = True
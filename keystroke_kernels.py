@@ -0,0 +1,26 @@
+"""
+Kernels numéricos de keystroke en Python puro.
+
+app.py los compila con Numba (JIT) y build_kernels.py los compila por
+adelantado (AOT) al módulo nativo ks_kernels.
+"""
+
+
+def pairwise_sim(dwell):
+    """
+    Similitud media entre todos los pares de intentos de una matriz (n_intentos, n_teclas)
+    """
+    n_attempts, n_keys = dwell.shape
+    total_sim = 0.0
+    pairs = 0
+    for i in range(n_attempts - 1):
+        for j in range(i + 1, n_attempts):
+            total_diff = 0.0
+            count = 0
+            for k in range(n_keys):
+                total_diff += abs(dwell[i, k] - dwell[j, k])
+                count += 1
+            if count > 0:
+                total_sim += max(0.0, 1.0 - (total_diff / count) / 200)
+            pairs += 1
+    return total_sim / pairs if pairs > 0 else 0.0
@@ -250,16 +250,17 @@ function analyzeKeystrokePattern(data) {
   };
 }
 
-async function sendPracticeAttempt(attemptData) {
+async function sendPracticeAttempts(attempts) {
     try {
-        console.log('📤 Enviando intento de práctica:', attemptData);
+        console.log('📤 Enviando intentos de práctica:', attempts);
         
+        // Se envían todos los intentos acumulados; el servidor no los guarda en sesión
         const response = await fetch('/register/practice', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify(attemptData)
+            body: JSON.stringify({ attempts: attempts })
         });
         
         const result = await response.json();
@@ -275,6 +276,7 @@ async function sendPracticeAttempt(attemptData) {
 async function handlePracticeSession(inputElement) {
     const recorder = new KeystrokeRecorder(inputElement);
     let attempts = 0;
+    const practiceAttempts = [];
     const maxAttempts = 3;
     
     // Auto-iniciar cuando el input reciba foco
@@ -288,6 +290,7 @@ async function handlePracticeSession(inputElement) {
     inputElement.addEventListener('blur', async function() {
         if (recorder.isRecording() && inputElement.value.length > 0) {
             const attemptData = recorder.stop();
+            practiceAttempts.push(attemptData);
             attempts++;
             
             // Mostrar feedback al usuario
@@ -297,8 +300,8 @@ async function handlePracticeSession(inputElement) {
                 feedbackEl.style.color = '#007bff';
             }
             
-            // Enviar el intento al servidor
-            const result = await sendPracticeAttempt(attemptData);
+            // Enviar los intentos acumulados al servidor
+            const result = await sendPracticeAttempts(practiceAttempts);
             
             if (result.success) {
                 if (attempts >= maxAttempts) {
@@ -315,6 +318,7 @@ async function handlePracticeSession(inputElement) {
                             feedbackEl.style.color = 'red';
                         }
                         attempts = 0;
+                        practiceAttempts.length = 0;
                         recorder.reset();
                     }
                 } else {